@@ -240,9 +240,7 @@ class XRDCalculator(object):
         # First applying the selection rule
         selected_i = np.where(np.apply_along_axis(sel_rule, 0, hkl_grid))[0]
         hkl_grid = hkl_grid[:, selected_i]
-        inv_d_grid = np.sqrt(np.sum(hkl_grid *
-                                    np.tensordot(hkl2d2, hkl_grid,
-                                                 axes=((1,), (0,))), axis=0))
+        inv_d_grid = utils.inv_plane_dist_batch(hkl_grid.T, hkl2d2)
 
         # Some will still have inv_d > inv_d_max, we fix that here
         # We also eliminate both 2theta = 0 and 2theta = pi to avoid
@@ -47,6 +47,22 @@ from ase.calculators.singlepoint import SinglePointCalculator
 from soprano import utils
 
 
+def _entries_array(values, dtype=None):
+    """Turn a list of per-structure values into an array. Named tuples
+    (as returned by some properties) are records, not sequences: unless a
+    dtype is requested they are stored whole, one per element of a
+    one-dimensional object array."""
+
+    if dtype is None and isinstance(values, (list, tuple)):
+        if any(isinstance(v, tuple) and hasattr(v, '_fields')
+               for v in values):
+            arr = np.empty(len(values), dtype=object)
+            for i, v in enumerate(values):
+                arr[i] = v
+            return arr
+    return np.array(values, dtype)
+
+
 class _AllCaller(object):
 
     """_AllCaller class.
@@ -325,12 +341,12 @@ class AtomsCollection(object):
         # a can be an actual array or a function that operates on each
         # separate Atoms object and returns a value
 
-        a = np.array(a, dtype)
+        a = _entries_array(a, dtype)
         if a.shape == ():
             a = a.item()
             if hasattr(a, '__call__'):
                 # It's a function
-                a = np.array(self.all.map(a, **args), dtype)
+                a = _entries_array(self.all.map(a, **args), dtype)
             else:
                 # Invalid
                 raise TypeError('new_array requires to pass either an array'
@@ -47,6 +47,16 @@ try:
 except ImportError:
     _sklearn = None
 
+try:
+    import joblib as _joblib
+except ImportError:
+    _joblib = None
+
+try:
+    import threadpoolctl as _threadpoolctl
+except ImportError:
+    _threadpoolctl = None
+
 
 """
 These decorators check if the required module is available, if not print
@@ -115,3 +125,23 @@ def requireScikitLearn(import_name='sklearn'):
         return wrapper
 
     return decorator
+
+
+def requireJoblib(import_name='joblib'):
+
+    def decorator(func):
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+
+            if _joblib is None:
+                raise RuntimeError('This function requires an installation of'
+                                   ' joblib to work - please install it '
+                                   'with:\n\tpip install joblib')
+            else:
+                kwargs[import_name] = _joblib
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -24,14 +24,22 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import numpy as np
-from scipy import constants as cnst
+from collections import namedtuple
+from soprano.optional import requireJoblib, _threadpoolctl
+from soprano.collection import AtomsCollection
 from soprano.properties import AtomsProperty
-from soprano.properties.nmr.utils import (_haeb_sort, _anisotropy, _asymmetry,
-                                          _span, _skew, _evecs_2_quat,
-                                          _get_nmr_data, _get_isotope_data,
+from soprano.properties.nmr.utils import (_haeb_sort, _efg_stats,
+                                          _evecs_2_quat, _get_isotope_data,
                                           EFG_TO_CHI)
 
 
+EFGDiag = namedtuple('EFGDiag', ('evals', 'evecs'))
+
+# Scalar parameters computed together by _efg_stats
+_EFG_STATS = ('vzz', 'anisotropy', 'red_anisotropy', 'asymmetry', 'span',
+              'skew')
+
+
 def _has_efg_check(f):
     # Decorator to add a check for the electric field gradient array
     def decorated_f(s, *args, **kwargs):
@@ -43,6 +51,25 @@ def _has_efg_check(f):
     return decorated_f
 
 
+def _get_efg_stat(s, stat, force_recalc):
+    # Compute all scalar parameters of the EFG tensors at once and store
+    # them as arrays, so that they follow the atoms when the structure is
+    # sliced. They are kept until the tensors are diagonalised again
+    if (not s.has(EFGDiagonal.default_name + '_evals_hsort') or
+            force_recalc):
+        EFGDiagonal.get(s)
+
+    if not s.has(EFGDiagonal.default_name + '_' + stat):
+        stats = _efg_stats(
+            s.get_array(EFGDiagonal.default_name + '_evals_hsort',
+                        copy=False),
+            s.get_array(EFGDiagonal.default_name + '_evals', copy=False))
+        for name, val in stats.items():
+            s.set_array(EFGDiagonal.default_name + '_' + name, val)
+
+    return s.get_array(EFGDiagonal.default_name + '_' + stat)
+
+
 class EFGDiagonal(AtomsProperty):
 
     """
@@ -57,34 +84,87 @@ class EFGDiagonal(AtomsProperty):
     | Parameters:
     |   save_array (bool): if True, save the diagonalised tensors in the
     |                      Atoms object as an array. By default True.
+    |   dtype (np.dtype): floating point type to use for the computation.
+    |                     np.float32 halves the memory traffic at the cost
+    |                     of precision. By default np.float64.
 
     | Returns:
-    |   efg_diag (np.ndarray): list of eigenvalues and eigenvectors
+    |   efg_diag (EFGDiag): named tuple of eigenvalues, shape (N, 3), and
+    |                       eigenvectors, shape (N, 3, 3)
 
     """
 
     default_name = 'efg_diagonal'
     default_params = {
-        'save_array': True
+        'save_array': True,
+        'dtype': np.float64
     }
 
     @staticmethod
     @_has_efg_check
-    def extract(s, save_array):
-
-        efg_diag = [np.linalg.eigh((efg+efg.T)/2.0)
-                    for efg in s.get_array('efg')]
-        efg_evals, efg_evecs = [np.array(a) for a in zip(*efg_diag)]
+    def extract(s, save_array, dtype):
+
+        # No need for a copy, the original array is never modified
+        efg = s.get_array('efg', copy=False).astype(dtype, copy=False)
+        # Well formed tensors are already symmetric, in which case there's
+        # no need to symmetrise them (LAPACK only reads one triangle)
+        triu = ([0, 0, 1], [1, 2, 2])
+        max_asym = np.abs(efg[:, triu[0], triu[1]] -
+                          efg[:, triu[1], triu[0]]).max(initial=0.0)
+        if max_asym > 1e-10:
+            efg = (efg+efg.swapaxes(-1, -2))/2.0
+        # One batched LAPACK call; a closed-form 3x3 solver is not
+        # faster at these sizes and loses precision on nearly axial
+        # tensors
+        efg_evals, efg_evecs = np.linalg.eigh(efg)
 
         if save_array:
+            # Remove the previous results, derived parameters included:
+            # set_array writes into existing arrays, keeping their dtype
+            for name in ('evals', 'evals_hsort', 'evecs') + _EFG_STATS:
+                s.set_array(EFGDiagonal.default_name + '_' + name, None)
             s.set_array(EFGDiagonal.default_name + '_evals', efg_evals)
             # Store also the Haeberlen sorted version
             s.set_array(EFGDiagonal.default_name +
                         '_evals_hsort', _haeb_sort(efg_evals))
             s.set_array(EFGDiagonal.default_name + '_evecs', efg_evecs)
 
-        return np.array([dict(zip(('evals', 'evecs'), efg))
-                         for efg in efg_diag])
+        return EFGDiag(evals=efg_evals, evecs=efg_evecs)
+
+    @classmethod
+    @requireJoblib('joblib')
+    def get_batch(self, structures, n_jobs=-1, joblib=None):
+        """Extract the property using the default parameters on many
+        structures at once, distributing them over a pool of threads.
+        Requires joblib. This is opt-in: every structure goes through the
+        same LAPACK, so when NumPy is linked against a multithreaded BLAS
+        the two thread pools may compete for cores. If threadpoolctl is
+        installed, BLAS is limited to one thread while the batch runs.
+
+        | Args:
+        |   structures (list[ase.Atoms] or AtomsCollection): structures from
+        |                                                   which to extract
+        |                                                   the property
+        |   n_jobs (int): number of threads to use. By default all cores.
+
+        | Returns:
+        |   efg_diags (list): the value of the property for each structure
+
+        """
+
+        if isinstance(structures, AtomsCollection):
+            structures = structures.structures
+
+        def run_batch():
+            return joblib.Parallel(n_jobs=n_jobs, prefer='threads')(
+                joblib.delayed(self.get)(s) for s in structures)
+
+        if _threadpoolctl is None:
+            return run_batch()
+        # The limit applies to the whole process, so it is set once for all
+        # the worker threads rather than by each of them
+        with _threadpoolctl.threadpool_limits(1, 'blas'):
+            return run_batch()
 
 
 class EFGVzz(AtomsProperty):
@@ -114,13 +194,7 @@ class EFGVzz(AtomsProperty):
     @_has_efg_check
     def extract(s, force_recalc):
 
-        if (not s.has(EFGDiagonal.default_name + '_evals_hsort') or
-                force_recalc):
-            EFGDiagonal.get(s)
-
-        efg_evals = s.get_array(EFGDiagonal.default_name + '_evals_hsort')
-
-        return efg_evals[:, -1]
+        return _get_efg_stat(s, 'vzz', force_recalc)
 
 
 class EFGAnisotropy(AtomsProperty):
@@ -151,13 +225,7 @@ class EFGAnisotropy(AtomsProperty):
     @_has_efg_check
     def extract(s, force_recalc):
 
-        if (not s.has(EFGDiagonal.default_name + '_evals_hsort') or
-                force_recalc):
-            EFGDiagonal.get(s)
-
-        efg_evals = s.get_array(EFGDiagonal.default_name + '_evals_hsort')
-
-        return _anisotropy(efg_evals)
+        return _get_efg_stat(s, 'anisotropy', force_recalc)
 
 
 class EFGReducedAnisotropy(AtomsProperty):
@@ -188,13 +256,7 @@ class EFGReducedAnisotropy(AtomsProperty):
     @_has_efg_check
     def extract(s, force_recalc):
 
-        if (not s.has(EFGDiagonal.default_name + '_evals_hsort') or
-                force_recalc):
-            EFGDiagonal.get(s)
-
-        efg_evals = s.get_array(EFGDiagonal.default_name + '_evals_hsort')
-
-        return _anisotropy(efg_evals, reduced=True)
+        return _get_efg_stat(s, 'red_anisotropy', force_recalc)
 
 
 class EFGAsymmetry(AtomsProperty):
@@ -225,13 +287,7 @@ class EFGAsymmetry(AtomsProperty):
     @_has_efg_check
     def extract(s, force_recalc):
 
-        if (not s.has(EFGDiagonal.default_name + '_evals_hsort') or
-                force_recalc):
-            EFGDiagonal.get(s)
-
-        efg_evals = s.get_array(EFGDiagonal.default_name + '_evals_hsort')
-
-        return _asymmetry(efg_evals)
+        return _get_efg_stat(s, 'asymmetry', force_recalc)
 
 
 class EFGSpan(AtomsProperty):
@@ -262,13 +318,7 @@ class EFGSpan(AtomsProperty):
     @_has_efg_check
     def extract(s, force_recalc):
 
-        if (not s.has(EFGDiagonal.default_name + '_evals_hsort') or
-                force_recalc):
-            EFGDiagonal.get(s)
-
-        efg_evals = s.get_array(EFGDiagonal.default_name + '_evals_hsort')
-
-        return _span(efg_evals)
+        return _get_efg_stat(s, 'span', force_recalc)
 
 
 class EFGSkew(AtomsProperty):
@@ -299,13 +349,7 @@ class EFGSkew(AtomsProperty):
     @_has_efg_check
     def extract(s, force_recalc):
 
-        if (not s.has(EFGDiagonal.default_name + '_evals_hsort') or
-                force_recalc):
-            EFGDiagonal.get(s)
-
-        efg_evals = s.get_array(EFGDiagonal.default_name + '_evals_hsort')
-
-        return _skew(efg_evals)
+        return _get_efg_stat(s, 'skew', force_recalc)
 
 
 class EFGQuadrupolarConstant(AtomsProperty):
@@ -361,9 +405,7 @@ class EFGQuadrupolarConstant(AtomsProperty):
     @_has_efg_check
     def extract(s, force_recalc, use_q_isotopes, isotopes, isotope_list):
 
-        if (not s.has(EFGDiagonal.default_name + '_evals_hsort') or
-                force_recalc):
-            EFGDiagonal.get(s)
+        vzz = _get_efg_stat(s, 'vzz', force_recalc)
 
         # First thing, build the isotope dictionary
         elems = s.get_chemical_symbols()
@@ -376,7 +418,8 @@ class EFGQuadrupolarConstant(AtomsProperty):
         q_list = _get_isotope_data(elems, 'Q', isotopes, isotope_list,
                                    use_q_isotopes)
 
-        return EFG_TO_CHI*q_list*EFGVzz.get(s)
+        # Vzz may be single precision, but the constant is always double
+        return EFG_TO_CHI*q_list*vzz.astype(np.float64)
 
 
 class EFGQuaternion(AtomsProperty):
@@ -32,11 +32,13 @@ EFG_TO_CHI = cnst.physical_constants['atomic unit of electric field '
 def _haeb_sort(evals):
     """Sort a list of eigenvalue triplets by Haeberlen convention"""
     evals = np.array(evals)
-    iso = np.average(evals, axis=1)
-    sort_i = np.argsort(np.abs(evals-iso[:, None]),
-                        axis=1)[:, [1, 0, 2]]
-    return evals[np.arange(evals.shape[0])[:, None],
-                 sort_i]
+    d = np.abs(evals-evals.mean(axis=1, keepdims=True))
+    # With only three values, the extremes are enough to find the order.
+    # Ties are broken the same way as a stable argsort would
+    i0 = np.argmin(d, axis=1)
+    i2 = 2-np.argmax(d[:, ::-1], axis=1)
+    i1 = 3-i0-i2
+    return np.take_along_axis(evals, np.stack([i1, i0, i2], axis=1), axis=1)
 
 
 def _anisotropy(haeb_evals, reduced=False):
@@ -48,11 +50,21 @@ def _anisotropy(haeb_evals, reduced=False):
     return (haeb_evals[:, 2]-(haeb_evals[:, 0]+haeb_evals[:, 1])/2.0)*f
 
 
+def _safe_asymmetry(num, red_aniso):
+    """Divide by the reduced anisotropy, returning zero for isotropic
+    tensors instead of producing NaNs"""
+
+    return np.divide(num, red_aniso,
+                     out=np.zeros_like(num,
+                                       dtype=np.result_type(num, red_aniso)),
+                     where=np.abs(red_aniso) > 1e-30)
+
+
 def _asymmetry(haeb_evals):
-    """Calculate asymmetry"""
+    """Calculate asymmetry. Zero for isotropic tensors"""
 
-    return (haeb_evals[:, 1]-haeb_evals[:, 0])/_anisotropy(haeb_evals,
-                                                           reduced=True)
+    return _safe_asymmetry(haeb_evals[:, 1]-haeb_evals[:, 0],
+                           _anisotropy(haeb_evals, reduced=True))
 
 
 def _span(evals):
@@ -70,15 +82,71 @@ def _skew(evals):
                          axis=1))/_span(evals)
 
 
+def _efg_stats(haeb_evals, evals):
+    """Calculate Vzz, anisotropy, reduced anisotropy, asymmetry, span and
+    skew in a single pass, given the eigenvalues both sorted with Haeberlen
+    convention and unsorted"""
+
+    aniso = haeb_evals[:, 2]-(haeb_evals[:, 0]+haeb_evals[:, 1])/2.0
+    red_aniso = aniso*2.0/3.0
+
+    e_max = np.amax(evals, axis=-1)
+    e_min = np.amin(evals, axis=-1)
+    e_sum = np.sum(evals, axis=-1)
+    span = e_max-e_min
+    # For three values the median is what's left of the sum
+    skew = 3*((e_sum-e_max-e_min)-e_sum/3.0)/span
+
+    return {
+        'vzz': haeb_evals[:, 2],
+        'anisotropy': aniso,
+        'red_anisotropy': red_aniso,
+        'asymmetry': _safe_asymmetry(haeb_evals[:, 1]-haeb_evals[:, 0],
+                                     red_aniso),
+        'span': span,
+        'skew': skew,
+    }
+
+
 def _evecs_2_quat(evecs):
     """Convert a set of eigenvectors to a Quaternion expressing the
     rotation of the tensor's PAS with respect to the Cartesian axes"""
 
     # First, guarantee that the eigenvectors express *proper* rotations
-    evecs = np.array(evecs)*np.linalg.det(evecs)[:, None, None]
-
-    # Then get the quaternions
-    return [Quaternion.from_matrix(evs.T) for evs in evecs]
+    evecs = np.array(evecs)
+    m = (evecs*np.sign(np.linalg.det(evecs))[:, None, None]).swapaxes(-1, -2)
+
+    # Then get the quaternions, all at once. For each matrix we pick the
+    # most stable of the four possible forms, with the same choice as
+    # ase.quaternions.Quaternion.from_matrix
+    m00, m11, m22 = m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]
+    use_x = (m22 < 0) & (m00 > m11)
+    use_y = (m22 < 0) & (m00 <= m11)
+    use_z = (m22 >= 0) & (m00 < -m11)
+    use_w = (m22 >= 0) & (m00 >= -m11)
+
+    # The component that is computed from the diagonal, for each form
+    d = np.sqrt(np.maximum(np.select([use_x, use_y, use_z, use_w],
+                                     [1+m00-m11-m22, 1-m00+m11-m22,
+                                      1-m00-m11+m22, 1+m00+m11+m22]),
+                           0))/2.0
+    fac = 1.0/(4*d)
+    # Sums and differences of off-diagonal terms, each giving one of the
+    # other components depending on the form
+    s01 = (m[:, 0, 1]+m[:, 1, 0])*fac
+    s02 = (m[:, 0, 2]+m[:, 2, 0])*fac
+    s12 = (m[:, 1, 2]+m[:, 2, 1])*fac
+    d21 = (m[:, 2, 1]-m[:, 1, 2])*fac
+    d02 = (m[:, 0, 2]-m[:, 2, 0])*fac
+    d10 = (m[:, 1, 0]-m[:, 0, 1])*fac
+
+    forms = [use_x, use_y, use_z, use_w]
+    quats = np.stack([np.select(forms, [d21, d02, d10, d]),
+                      np.select(forms, [d, s01, s02, d21]),
+                      np.select(forms, [s01, d, s12, d02]),
+                      np.select(forms, [s02, s12, d, d10])], axis=1)
+
+    return [Quaternion(q) for q in quats]
 
 
 def _dip_constant(Rij, gi, gj):
@@ -95,30 +163,33 @@ def _J_constant(Kij, gi, gj):
     return cnst.h*gi*gj*Kij/(4*np.pi**2)*1e19
 
 
-try:
-    _nmr_data = pkgutil.get_data('soprano',
-                                 'data/nmrdata.json').decode('utf-8')
-    _nmr_data = json.loads(_nmr_data)
-except IOError:
-    _nmr_data = None
+# Parsed lazily on first use, see _get_nmr_data
+_nmr_data = None
 
 
 def _get_nmr_data():
 
-    if _nmr_data is not None:
-        return _nmr_data
-    else:
-        raise RuntimeError('NMR data not available. Something may be '
-                           'wrong with this installation of Soprano')
+    global _nmr_data
+
+    if _nmr_data is None:
+        try:
+            _nmr_data = json.loads(pkgutil.get_data(
+                'soprano', 'data/nmrdata.json').decode('utf-8'))
+        except IOError:
+            raise RuntimeError('NMR data not available. Something may be '
+                               'wrong with this installation of Soprano')
+
+    return _nmr_data
 
 
 def _get_isotope_data(elems, key, isotopes={}, isotope_list=None,
                       use_q_isotopes=False):
 
-    data = np.zeros(len(elems))
     nmr_data = _get_nmr_data()
 
-    for i, e in enumerate(elems):
+    # Resolve the default isotope only once per element
+    el_isos = {}
+    for e in set(elems):
 
         if e not in nmr_data:
             # Non-existing element
@@ -129,16 +200,25 @@ def _get_isotope_data(elems, key, isotopes={}, isotope_list=None,
             iso = nmr_data[e]['Q_iso']
         if e in isotopes:
             iso = isotopes[e]
-        if isotope_list is not None and isotope_list[i] is not None:
-            iso = isotope_list[i]
+        el_isos[e] = iso
+
+    if isotope_list is None:
+        isos = [el_isos[e] for e in elems]
+    else:
+        isos = [el_isos[e] if iso is None else iso
+                for e, iso in zip(elems, isotope_list)]
 
+    # Then look up each isotope actually present, again only once
+    iso_data = {}
+    for e, iso in set(zip(elems, isos)):
         try:
-            data[i] = nmr_data[e][str(iso)][key]
+            iso_data[(e, iso)] = nmr_data[e][str(iso)][key]
         except KeyError:
             raise RuntimeError('Data {0} does not exist for isotope {1} of '
                                'element {2}'.format(key, iso, e))
 
-    return data
+    return np.fromiter((iso_data[ei] for ei in zip(elems, isos)),
+                       dtype=float, count=len(elems))
 
 
 def _el_iso(sym):
@@ -95,6 +95,35 @@ def silence_stdio(silence_stdout=True, silence_stderr=True):
             sys.stderr = old_stderr
 
 
+# Cache for _sincos, keyed by the angles themselves
+_sincos_cache = {}
+_SINCOS_CACHE_SIZE = 128
+
+
+def _sincos(angles):
+    """Sines and cosines of the three lattice angles. These are cached, as
+       the same cell is often passed to several lattice routines in a row.
+       The returned arrays are read-only
+
+    """
+
+    key = tuple(angles.tolist())
+    try:
+        return _sincos_cache[key]
+    except KeyError:
+        pass
+
+    if len(_sincos_cache) >= _SINCOS_CACHE_SIZE:
+        _sincos_cache.clear()
+    sin = np.sin(angles)
+    cos = np.cos(angles)
+    sin.setflags(write=False)
+    cos.setflags(write=False)
+    _sincos_cache[key] = (sin, cos)
+
+    return sin, cos
+
+
 def abc2cart(abc):
     """Transforms an axes and angles representation of lattice parameters
        into a Cartesian one
@@ -107,8 +136,7 @@ def abc2cart(abc):
         raise ValueError("Invalid abc passed to abc2cart")
 
     cart = []
-    sin = np.sin(abc[1, :])
-    cos = np.cos(abc[1, :])
+    sin, cos = _sincos(abc[1, :])
     cart.append([sin[2], cos[2], 0.0])
     cart.append([0.0, 1.0, 0.0])
     cart.append([(cos[1]-cos[0]*cos[2])/sin[2], cos[0], 0.0])
@@ -152,22 +180,21 @@ def hkl2d2_matgen(abc):
     if abc.shape != (2, 3):
         raise ValueError("Invalid abc passed to hkl2d2_matgen")
 
-    sin = np.sin(abc[1, :])
-    cos = np.cos(abc[1, :])
+    sin, cos = _sincos(abc[1, :])
     a2b2 = (abc[0, 0]*abc[0, 1])**2.0
     a2c2 = (abc[0, 0]*abc[0, 2])**2.0
     b2c2 = (abc[0, 1]*abc[0, 2])**2.0
     abc_prod = np.prod(abc[0, :])
 
-    hkl2d2 = np.matrix([[b2c2*sin[0]**2.0,
-                         abc_prod*abc[0, 2]*(cos[0]*cos[1]-cos[2]),
-                         abc_prod*abc[0, 1]*(cos[0]*cos[2]-cos[1])],
-                        [abc_prod*abc[0, 2]*(cos[0]*cos[1]-cos[2]),
-                         a2c2*sin[1]**2.0,
-                         abc_prod*abc[0, 0]*(cos[1]*cos[2]-cos[0])],
-                        [abc_prod*abc[0, 1]*(cos[0]*cos[2]-cos[1]),
-                         abc_prod*abc[0, 0]*(cos[1]*cos[2]-cos[0]),
-                         a2b2*sin[2]**2.0]])
+    hkl2d2 = np.array([[b2c2*sin[0]**2.0,
+                        abc_prod*abc[0, 2]*(cos[0]*cos[1]-cos[2]),
+                        abc_prod*abc[0, 1]*(cos[0]*cos[2]-cos[1])],
+                       [abc_prod*abc[0, 2]*(cos[0]*cos[1]-cos[2]),
+                        a2c2*sin[1]**2.0,
+                        abc_prod*abc[0, 0]*(cos[1]*cos[2]-cos[0])],
+                       [abc_prod*abc[0, 1]*(cos[0]*cos[2]-cos[1]),
+                        abc_prod*abc[0, 0]*(cos[1]*cos[2]-cos[0]),
+                        a2b2*sin[2]**2.0]])
 
     hkl2d2 /= abc_prod**2.0*(1.0-np.dot(cos, cos)+2.0*np.prod(cos))
 
@@ -185,7 +212,21 @@ def inv_plane_dist(hkl, hkl2d2):
     if hkl.shape != (3,):
         raise ValueError("Invalid hkl passed to inv_plane_dist")
 
-    return np.sqrt(np.dot(np.dot(hkl2d2, hkl), hkl)[0, 0])
+    return inv_plane_dist_batch(hkl[None, :], hkl2d2)[0]
+
+
+def inv_plane_dist_batch(hkls, hkl2d2):
+    """Calculate inverse planar distances for an array of sets of
+       Miller indices h, k, l, of shape (N, 3).
+
+    """
+
+    hkls = np.array(hkls, copy=False)
+
+    if len(hkls.shape) != 2 or hkls.shape[-1] != 3:
+        raise ValueError("Invalid hkls passed to inv_plane_dist_batch")
+
+    return np.sqrt(np.einsum('ni,ij,nj->n', hkls, hkl2d2, hkls))
 
 
 def minimum_supcell(max_r, latt_cart=None, r_matrix=None,
@@ -234,37 +275,19 @@ def minimum_supcell(max_r, latt_cart=None, r_matrix=None,
     # in absolute space.
     # This becomes a rotated ellipsoid in fractional coordinates space.
     # r_matrix represents a quadratic form which turns a fractional coordinate
-    # into a squared distance in space.
-    # By diagonalizing it we can calculate the transformation matrix
-    # which morphs a simple unit sphere into this ellipsoid through
-    # scaling (with the eigenvalues) and rotating (with the eigenvectors).
-    # We have thus that a point p in unit sphere space becomes q = M*p
-    # in fractional space. On the other hand, a point q in fractional space
-    # will be transformed into absolute space by p = M^-1*q.
-    # Now, the boundaries of the ellipsoids are none other but the points
-    # which, in regular space, have normals aligned with the axes.
-    # And NORMALS transform between spaces with a matrix that is the
-    # inverse transpose of the regular one. So the logic goes:
-    # - take an axis direction in fractional space (for example, [1,0,0])
-    # - transform it into absolute space by premultiplying (M^-1)^-1^T = M^T
-    # - now that we have the direction of the normal in absolute space,
-    # we just need to normalize it to find the point p which has that normal
-    # (thanks to the properties of the unit sphere)
-    # - then we transform back to fractional space with M and there you go,
-    # that's your boundary point.
-    # - wash, rinse, repeat for all axes directions.
-    # Find the maxima in each direction and you've got your box.
-
-    r_evals, r_evecs = np.linalg.eigh(r_matrix)
-
-    # Unit sphere - to - ellipsoid transformation matrix
-    utransf_matrix = np.dot(r_evecs, np.diag(1.0/np.sqrt(r_evals)))
-    # To find the boundaries, we need to iterate over the three main
-    # directions. We do this implicitly though.
-    qmatrix = np.dot(utransf_matrix,
-                     max_r*(utransf_matrix/np.linalg.norm(utransf_matrix,
-                                                          axis=1)[:, None]).T)
-    r_bounds = np.max(np.ceil(abs(qmatrix)), axis=1).astype(int)
+    # into a squared distance in space, so the ellipsoid is the set of points
+    # q such that q^T*r_matrix*q <= max_r^2.
+    # The extent of such an ellipsoid along axis i is found by maximising
+    # q_i under that constraint. With a Lagrange multiplier one finds that
+    # the maximum is reached for q proportional to r_matrix^-1*e_i, and that
+    # its value is max_r*sqrt((r_matrix^-1)_ii). So the half-widths of the
+    # box are simply given by the diagonal of the inverse matrix.
+
+    r_bounds = max_r*np.sqrt(np.diagonal(np.linalg.inv(r_matrix)))
+    # The half-widths are in units of cells. When the sphere exactly
+    # touches a plane of the lattice (e.g. max_r a multiple of the side of
+    # an orthorhombic cell) rounding errors must not add a whole cell
+    r_bounds = np.ceil(r_bounds-1e-8).astype(int)
     r_bounds = np.where(pbc, r_bounds, 0)
 
     return tuple([2*r+1 for r in r_bounds])
@@ -299,14 +322,13 @@ def supcell_gridgen(latt_cart, shape):
 
     min_bounds = (-((shape-1)/2)).astype(int)
     max_bounds = shape+min_bounds
-    x_range = range(min_bounds[0], max_bounds[0])
-    y_range = range(min_bounds[1], max_bounds[1])
-    z_range = range(min_bounds[2], max_bounds[2])
 
     # We now generate a grid of neighbours to check for contact with
-    # First just the supercell indicess
-    neigh_i_grid = np.swapaxes(np.meshgrid(x_range, y_range, z_range), 0, 3)
-    neigh_i_grid = np.reshape(neigh_i_grid, (-1, 3))
+    # First just the supercell indices, with x running fastest
+    neigh_i_grid = np.mgrid[min_bounds[2]:max_bounds[2],
+                            min_bounds[1]:max_bounds[1],
+                            min_bounds[0]:max_bounds[0]].reshape((3, -1)).T
+    neigh_i_grid = np.ascontiguousarray(neigh_i_grid[:, ::-1])
     # Then the actual supercell cartesian shifts
     neigh_grid = np.dot(neigh_i_grid, latt_cart)
 
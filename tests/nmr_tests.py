@@ -17,10 +17,13 @@ from ase.quaternions import Quaternion
 from soprano.properties.nmr import (MSIsotropy, MSAnisotropy,
                                     MSReducedAnisotropy, MSAsymmetry,
                                     MSSpan, MSSkew,
-                                    EFGVzz, EFGAsymmetry,
+                                    EFGDiagonal, EFGVzz, EFGAsymmetry,
                                     EFGQuadrupolarConstant,
                                     EFGQuaternion, DipolarCoupling)
+from soprano.properties.nmr.utils import _asymmetry
 from soprano.selection import AtomSelection
+from soprano.collection import AtomsCollection
+from soprano.optional import _joblib
 
 _TESTDATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                              "test_data")
@@ -90,6 +93,97 @@ class TestNMR(unittest.TestCase):
             self.assertTrue(np.isclose((phi*2) % np.pi, 0) or
                             np.isclose((phi*2) % np.pi, np.pi))
 
+    def test_efg_slicing(self):
+
+        eth = io.read(os.path.join(_TESTDATA_DIR, 'ethanol.magres'))
+
+        qprop = EFGQuadrupolarConstant(isotopes={'H': 2})
+        asymm = EFGAsymmetry.get(eth)
+        vzz = EFGVzz.get(eth)
+        qcnst = qprop(eth)
+
+        # The derived parameters must follow the atoms in a subset
+        self.assertTrue(np.allclose(EFGAsymmetry.get(eth[[0, 1]]),
+                                    asymm[:2]))
+        csel = AtomSelection.from_element(eth, 'C')
+        self.assertTrue(np.allclose(EFGVzz.get(csel.subset(eth)),
+                                    vzz[csel.indices]))
+        self.assertTrue(np.allclose(qprop(eth[[0, 1, 2]]), qcnst[:3]))
+
+        # Altering the returned values must not alter the stored ones
+        asymm_ref = asymm.copy()
+        asymm[:] = 99
+        self.assertTrue(np.allclose(EFGAsymmetry.get(eth), asymm_ref))
+
+    def test_efg_collection(self):
+
+        eth = io.read(os.path.join(_TESTDATA_DIR, 'ethanol.magres'))
+        coll = AtomsCollection([eth, eth[:5]])
+
+        diags = EFGDiagonal.get(coll, store_array=True)
+        stored = coll.get_array('efg_diagonal')
+
+        self.assertEqual(stored.shape, (2,))
+        for i, s in enumerate(coll.structures):
+            ref = EFGDiagonal.get(s)
+            self.assertTrue(np.allclose(diags[i].evals, ref.evals))
+            self.assertTrue(np.allclose(stored[i].evals, ref.evals))
+            self.assertTrue(np.allclose(stored[i].evecs, ref.evecs))
+
+    def test_efg_float32(self):
+
+        eth = io.read(os.path.join(_TESTDATA_DIR, 'ethanol.magres'))
+        eth32 = eth.copy()
+
+        qprop = EFGQuadrupolarConstant(isotopes={'H': 2})
+        asymm = EFGAsymmetry.get(eth)
+        vzz = EFGVzz.get(eth)
+        qcnst = qprop(eth)
+
+        diag32 = EFGDiagonal(dtype=np.float32)(eth32)
+        self.assertEqual(diag32.evals.dtype, np.float32)
+        self.assertEqual(diag32.evecs.dtype, np.float32)
+
+        # The derived parameters use the stored single precision data
+        asymm32 = EFGAsymmetry.get(eth32)
+        vzz32 = EFGVzz.get(eth32)
+        qcnst32 = qprop(eth32)
+        self.assertEqual(vzz32.dtype, np.float32)
+        self.assertEqual(qcnst32.dtype, np.float64)
+        self.assertTrue(np.allclose(asymm32, asymm, rtol=1e-4, atol=1e-4))
+        self.assertTrue(np.allclose(vzz32, vzz, rtol=1e-4, atol=1e-4))
+        self.assertTrue(np.allclose(qcnst32, qcnst, rtol=1e-4))
+
+        # Going back to double precision on the same structure
+        EFGDiagonal.get(eth32)
+        self.assertEqual(eth32.get_array('efg_diagonal_evals').dtype,
+                         np.float64)
+        self.assertEqual(eth32.get_array('efg_diagonal_evecs').dtype,
+                         np.float64)
+        vzz64 = EFGVzz(force_recalc=True)(eth32)
+        self.assertEqual(vzz64.dtype, np.float64)
+        self.assertTrue(np.allclose(vzz64, vzz, rtol=1e-12, atol=0))
+
+    @unittest.skipIf(_joblib is None, 'joblib is not installed')
+    def test_efg_batch(self):
+
+        eth = io.read(os.path.join(_TESTDATA_DIR, 'ethanol.magres'))
+        structures = [eth, eth[:5], eth[3:]]
+        coll = AtomsCollection([s.copy() for s in structures])
+
+        diags = EFGDiagonal.get_batch(coll, n_jobs=2)
+
+        self.assertEqual(len(diags), len(structures))
+        for d, s in zip(diags, structures):
+            ref = EFGDiagonal.get(s)
+            self.assertTrue(np.allclose(d.evals, ref.evals))
+            self.assertTrue(np.allclose(d.evecs, ref.evecs))
+
+    def test_asymmetry_isotropic(self):
+
+        haeb_evals = np.array([[1.0, 1.0, 1.0], [-1.0, 0.0, 2.0]])
+        self.assertTrue(np.allclose(_asymmetry(haeb_evals), [0.0, 0.6]))
+
     def test_dipolar(self):
 
         eth = io.read(os.path.join(_TESTDATA_DIR, 'ethanol.magres'))
@@ -82,6 +82,16 @@ class TestLatticeMethods(unittest.TestCase):
         cart = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
         self.assertTrue(np.allclose(cart2abc(cart), abc))
 
+    def test_inv_plane_dist(self):
+        abc = np.array([[2, 2, 2], [np.pi/2, np.pi/2, np.pi/2]])
+        hkl2d2 = hkl2d2_matgen(abc)
+        hkls = np.array([[1, 0, 0], [1, 1, 0], [1, 2, 3], [0, 0, 0]])
+        inv_d = np.sqrt(np.sum(hkls**2, axis=1))/2.0
+        self.assertTrue(np.allclose(inv_plane_dist_batch(hkls, hkl2d2),
+                                    inv_d))
+        for hkl, d in zip(hkls, inv_d):
+            self.assertAlmostEqual(inv_plane_dist(hkl, hkl2d2), d)
+
 
 class TestSupercellMethods(unittest.TestCase):
 
@@ -121,6 +131,42 @@ class TestSupercellMethods(unittest.TestCase):
             sphere_bf_p = set([tuple(p) for p in sphere_bf_p])
             self.assertEqual(sphere_p, sphere_bf_p)
 
+    def test_min_supcell_exact(self):
+
+        from ase.quaternions import Quaternion
+
+        # Spheres touching the lattice planes exactly
+        for a in np.arange(0.5, 10, 0.1):
+            cart = np.diag([a, a*1.5, a*2])
+            for k in range(1, 6):
+                self.assertEqual(minimum_supcell(k*a, latt_cart=cart)[0],
+                                 2*k+1)
+
+        # A skewed cell whose third axis is at a distance of 2 from the
+        # plane of the other two, shouldn't depend on its orientation
+        cart = np.array([[1.0, 0, 0], [0.5, 1.0, 0], [0.3, 0.2, 2.0]])
+        shapes = {1.0: (5, 5, 3), 2.0: (7, 7, 3), 4.0: (11, 11, 5)}
+        for angles in [(0, 0, 0), (0.3, 1.2, -0.7), (1.1, 0.4, 2.0),
+                       (2.5, -0.3, 0.9)]:
+            rot = Quaternion.from_euler_angles(*angles).rotation_matrix()
+            rot_cart = np.dot(cart, rot.T)
+            for max_r, shape in shapes.items():
+                self.assertEqual(minimum_supcell(max_r, latt_cart=rot_cart),
+                                 shape)
+
+    def test_supcell_gridgen(self):
+
+        cart = np.diag([1.0, 2.0, 3.0])
+        grid_i, grid = supcell_gridgen(cart, (2, 3, 4))
+
+        # Indices run with x fastest and z slowest
+        x, y, z = np.meshgrid(range(0, 2), range(-1, 2), range(-1, 3),
+                              indexing='ij')
+        ref = np.array([x.T.flatten(), y.T.flatten(), z.T.flatten()]).T
+        self.assertTrue(np.array_equal(grid_i, ref))
+        self.assertTrue(np.issubdtype(grid_i.dtype, np.integer))
+        self.assertTrue(np.allclose(grid, ref*[1.0, 2.0, 3.0]))
+
     def test_min_periodic(self):
 
         # Just a simple check